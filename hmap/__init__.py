@@ -1,2 +1,3 @@
 from . import plot
 from . import layout
+from . import cluster
@@ -0,0 +1,203 @@
+'''This module offers the ``hmap`` command line interface for rendering
+clustered heatmaps without a display.
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pnd
+import matplotlib
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+def readTable(path, dtype = None, sep = None):
+    '''Function, that reads a table with row ids in the first column. Parquet
+    and Feather files are read via pyarrow. Delimited text files are parsed
+    by pyarrow if it is installed, else by the pandas C parser, both of which
+    parse the value columns directly into dtype.
+
+    :param path: Path of the table. Files ending in .parquet, .pq, or
+        .feather are read as columnar files, all others as delimited text.
+    :type path: str
+    :param dtype: Data type of all value columns, e.g. "float32", if None
+        the types are inferred, defaults to None.
+    :type dtype: str, optional
+    :param sep: Delimiter of text files. If None, "," is used for files
+        ending in .csv, else tab, defaults to None.
+    :type sep: str, optional
+
+    :return: Table with row ids as index.
+    :rtype: :class:`pandas.DataFrame`
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if(extension in [".parquet", ".pq", ".feather"]):
+        if(extension == ".feather"):
+            table = pnd.read_feather(path)
+        else:
+            table = pnd.read_parquet(path)
+        # Columnar files without a stored index keep the ids in a column
+        if(isinstance(table.index, pnd.RangeIndex)):
+            table = table.set_index(table.columns[0])
+        return table.astype(dtype) if dtype is not None else table
+
+    if(sep is None):
+        sep = "," if extension == ".csv" else "\t"
+
+    # The index column keeps its inferred type
+    column_dtypes = None
+    if(dtype is not None):
+        header = pnd.read_csv(path, sep=sep, index_col=0, nrows=0)
+        column_dtypes = dict((column, dtype) for column in header.columns)
+
+    engine = "pyarrow" if pyarrow is not None else "c"
+    return pnd.read_csv(path, sep=sep, index_col=0, dtype=column_dtypes,
+                        engine=engine)
+
+def main(argv = None):
+    '''Entry point of the ``hmap`` command.
+
+    :param argv: Command line arguments, if None sys.argv is used, defaults
+        to None.
+    :type argv: list, optional
+
+    :return: Exit code.
+    :rtype: int
+    '''
+    args = _parser().parse_args(argv)
+    if(args.command is None):
+        _parser().print_help()
+        return 2
+    return _render(args)
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="hmap",
+                                     description="Heatmap clustering and "
+                                     "plotting.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    render = subparsers.add_parser("render",
+                                   help="Render a clustered heatmap to PNG, "
+                                   "or PDF.")
+    render.add_argument("matrix", help="Data matrix (TSV, CSV, Parquet, or "
+                        "Feather) with row ids in the first column.")
+    render.add_argument("-o", "--output", required=True,
+                        help="Output file, the format is taken from the "
+                        "extension.")
+    render.add_argument("--row-annotation", help="Table annotating the rows.")
+    render.add_argument("--row-annotation-columns", nargs="+",
+                        help="Columns of the row annotation to be plotted, "
+                        "defaults to all.")
+    render.add_argument("--column-annotation",
+                        help="Table annotating the columns.")
+    render.add_argument("--column-annotation-columns", nargs="+",
+                        help="Columns of the column annotation to be "
+                        "plotted, defaults to all.")
+    render.add_argument("--sep", help="Delimiter of text files.")
+
+    clustering = render.add_argument_group("clustering")
+    clustering.add_argument("--distance-metric", default="correlation")
+    clustering.add_argument("--linkage-method", default="complete")
+    clustering.add_argument("--no-row-clustering", action="store_true")
+    clustering.add_argument("--no-column-clustering", action="store_true")
+    clustering.add_argument("--no-optimal-ordering", action="store_true")
+    clustering.add_argument("--low-memory", action="store_true",
+                            help="Cluster without the full distance matrix.")
+    clustering.add_argument("--nan-policy", default="propagate",
+                            choices=["propagate", "pairwise"])
+    clustering.add_argument("--n-jobs", type=int, default=None,
+                            help="Number of threads, defaults to all cores.")
+
+    colors = render.add_argument_group("colors")
+    colors.add_argument("--cmap", default="Reds")
+    colors.add_argument("--vmin", type=float, default=None)
+    colors.add_argument("--vmax", type=float, default=None)
+    colors.add_argument("--symmetric-color-scale", action="store_true")
+    colors.add_argument("--symmetry-point", type=float, default=0.)
+    colors.add_argument("--show-row-labels", action="store_true")
+    colors.add_argument("--show-column-labels", action="store_true")
+
+    layout = render.add_argument_group("layout (in mm)")
+    layout.add_argument("--heatmap-width", type=float, default=80.)
+    layout.add_argument("--heatmap-height", type=float, default=80.)
+    layout.add_argument("--dendrogram-size", type=float, default=10.)
+    layout.add_argument("--annotation-size", type=float, default=2.)
+    layout.add_argument("--legend-width", type=float, default=40.)
+    layout.add_argument("--space", type=float, default=1.)
+    layout.add_argument("--margins", type=float, nargs=4,
+                        default=[20., 15., 15., 20.],
+                        metavar=("BOTTOM", "TOP", "LEFT", "RIGHT"))
+    layout.add_argument("--dpi", type=float, default=300.)
+
+    return parser
+
+def _render(args):
+    # Select the non-interactive backend before any figure is created
+    matplotlib.use("Agg")
+    from .plot.batch import renderFigure
+
+    timings = []
+    start = time.time()
+    table = readTable(args.matrix, dtype=np.float32, sep=args.sep)
+    timings.append(("read matrix", time.time()-start))
+
+    start = time.time()
+    spec = {"table": table, "output": args.output, "dpi": args.dpi}
+    for key in ["row", "column"]:
+        path = getattr(args, key+"_annotation")
+        if(path is None):
+            continue
+        annotation_df = readTable(path, sep=args.sep)
+        columns = getattr(args, key+"_annotation_columns")
+        spec[key+"_annotation"] = annotation_df
+        spec[key+"_annotation_columns"] = (columns if columns is not None
+                                           else list(annotation_df.columns))
+    timings.append(("read annotations", time.time()-start))
+
+    bottom, top, left, right = args.margins
+    spec["layout"] = {"dendrogram_size": args.dendrogram_size,
+                      "annotation_size": args.annotation_size,
+                      "heatmap_width": args.heatmap_width,
+                      "heatmap_height": args.heatmap_height,
+                      "legend_width": args.legend_width,
+                      "space": args.space,
+                      "bottom": bottom,
+                      "top": top,
+                      "left": left,
+                      "right": right}
+    spec["heatmap"] = {"cmap": args.cmap,
+                       "distance_metric": args.distance_metric,
+                       "linkage_method": args.linkage_method,
+                       "row_clustering": not args.no_row_clustering,
+                       "column_clustering": not args.no_column_clustering,
+                       "optimal_row_ordering": not args.no_optimal_ordering,
+                       "optimal_col_ordering": not args.no_optimal_ordering,
+                       "low_memory": args.low_memory,
+                       "nan_policy": args.nan_policy,
+                       "n_jobs": args.n_jobs,
+                       "vmin": args.vmin,
+                       "vmax": args.vmax,
+                       "symmetric_color_scale": args.symmetric_color_scale,
+                       "symmetry_point": args.symmetry_point,
+                       "show_row_labels": args.show_row_labels,
+                       "show_column_labels": args.show_column_labels}
+
+    result = renderFigure(spec)
+    timings += list(result["stages"].items())
+
+    print("{:<20} {:>10}".format("stage", "time [s]"))
+    for stage, duration in timings:
+        print("{:<20} {:>10.3f}".format(stage, duration))
+    print("{:<20} {:>10.3f}".format("total",
+                                    sum(duration for stage, duration
+                                        in timings)))
+
+    if(result["error"] is not None):
+        sys.stderr.write(result["error"])
+        return 1
+    return 0
@@ -0,0 +1,4 @@
+from . import distance
+from . import nnchain
+from . import linkage
+from . import bootstrap
@@ -0,0 +1,240 @@
+'''This module offers bootstrap based stability scores for the clusters of a
+hierarchical clustering. Approximately unbiased (AU) p-values are computed
+via multiscale bootstrap resampling of the features, as done by pvclust
+(Suzuki and Shimodaira, 2006).
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pnd
+from scipy.stats import norm
+
+from .distance import nJobs
+from .linkage import linkageMatrix
+
+# Relative sample sizes of the multiscale bootstrap, as used by pvclust
+default_scales = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4]
+
+# Data and settings of the current worker process
+_worker = {}
+
+def cladeHashes(linkage_matrix, seed = 0):
+    '''Function, that represents each cluster of a linkage matrix by its
+    number of leaves, and the XOR of random 64 bit hashes of its leaves.
+    Identical clusters of linkage matrices of the same leaves get identical
+    keys, for a given seed. Different clusters collide only with negligible
+    probability.
+
+    :param linkage_matrix: Linkage matrix as returned by
+        scipy.cluster.hierarchy.linkage.
+    :type linkage_matrix: :class:`numpy.ndarray`
+    :param seed: Seed of the random leaf hashes, defaults to 0.
+    :type seed: int, optional
+
+    :return: List of tuples of size, and hash, one per row of the linkage
+        matrix.
+    :rtype: list
+    '''
+    n = len(linkage_matrix)+1
+    hashes = [ int(h) for h in np.random.default_rng(seed).integers(
+        0, 2**64, n, dtype=np.uint64) ]
+    for a, b in linkage_matrix[:, :2].astype(int):
+        hashes.append(hashes[a] ^ hashes[b])
+    return list(zip(linkage_matrix[:, 3].astype(int).tolist(), hashes[n:]))
+
+def bootstrapStability(table,
+                       distance_metric = "correlation",
+                       linkage_method = "complete",
+                       axis = 0,
+                       linkage_matrix = None,
+                       n_boot = 100,
+                       scales = default_scales,
+                       seed = None,
+                       n_jobs = None,
+                       low_memory = False,
+                       nan_policy = "propagate"):
+    '''Function, that computes bootstrap stability scores for each cluster of
+    the hierarchical clustering of rows (axis = 0), or columns (axis = 1) of
+    table. The features are resampled with replacement at several relative
+    sample sizes, the trees are rebuilt in a process pool, and the
+    occurrences of each cluster are counted. From these counts approximately
+    unbiased (AU), and bootstrap probability (BP) values are fitted.
+
+    :param table: Data matrix used for clustering.
+    :type table: :class:`pandas.DataFrame`
+    :param distance_metric: Distance metric, see Dendrogram, defaults to
+        "correlation".
+    :type distance_metric: str, optional
+    :param linkage_method: Linkage method, see Dendrogram, defaults to
+        "complete".
+    :type linkage_method: str, optional
+    :param axis: Axis of table, that is clustered (0 = rows, 1 = columns),
+        defaults to 0.
+    :type axis: int, optional
+    :param linkage_matrix: Linkage matrix, whose clusters are scored, e.g.
+        the one returned by Dendrogram. If None, it is computed from table,
+        defaults to None.
+    :type linkage_matrix: :class:`numpy.ndarray`, optional
+    :param n_boot: Number of bootstrap replicates per scale, defaults to 100.
+    :type n_boot: int, optional
+    :param scales: Relative sample sizes of the resampled features. The
+        numbers of features are rounded, and the fit uses the resulting
+        relative sample sizes, defaults to default_scales.
+    :type scales: list, optional
+    :param seed: Seed of the random number generator. Results are
+        reproducible for a given seed, independent of n_jobs, defaults to
+        None.
+    :type seed: int, optional
+    :param n_jobs: Number of worker processes. If None, all available cores
+        are used. If 1, the replicates are computed in the current process.
+        Multiple processes require Python 3.8 or later, defaults to None.
+    :type n_jobs: int, optional
+    :param low_memory: If True, the trees are built with
+        hmap.cluster.nnchain.nnChainLinkage, defaults to False.
+    :type low_memory: bool, optional
+    :param nan_policy: Handling of missing values, see Dendrogram, defaults
+        to "propagate".
+    :type nan_policy: str, optional
+
+    :return: DataFrame with one row per row of the linkage matrix, indexed by
+        the cluster id (number of leaves + row index). Columns are "au", and
+        "bp", the fitted AU, and BP values, "size", the number of leaves, and
+        "height", the height of the cluster in the dendrogram.
+    :rtype: :class:`pandas.DataFrame`
+    '''
+    data = np.ascontiguousarray(table if axis == 0 else table.T, dtype=float)
+    settings = {"distance_metric": distance_metric,
+                "linkage_method": linkage_method,
+                "low_memory": low_memory,
+                "nan_policy": nan_policy,
+                "n_jobs": 1}
+    if(linkage_matrix is None):
+        linkage_matrix = linkageMatrix(data, **dict(settings, n_jobs=n_jobs))
+
+    clades = cladeHashes(linkage_matrix)
+    replicate_seeds = np.random.SeedSequence(seed).spawn(len(scales)*n_boot)
+
+    # Numbers of resampled features, and the realised relative sample sizes
+    n_features = data.shape[1]
+    sizes = [ max(1, int(round(scale*n_features))) for scale in scales ]
+
+    # One task per scale and worker, each with its own replicate seeds
+    n_jobs = nJobs(n_jobs)
+    n_chunks = min(n_jobs, n_boot)
+    tasks = []
+    for i, size in enumerate(sizes):
+        seeds = replicate_seeds[i*n_boot:(i+1)*n_boot]
+        for chunk in range(n_chunks):
+            tasks.append((i, size, seeds[chunk::n_chunks]))
+
+    counts = np.zeros((len(scales), len(clades)))
+    n_valid = np.zeros(len(scales))
+    if(n_jobs == 1):
+        _initWorker(None, data.shape, data.dtype.str, clades, settings,
+                    data=data)
+        results = [ _bootstrapCounts(size, seeds)
+                    for i, size, seeds in tasks ]
+        _worker.clear()
+    else:
+        # Available from Python 3.8 on
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes,
+                                                               1))
+        try:
+            np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=_initWorker,
+                                     initargs=(shm.name, data.shape,
+                                               data.dtype.str, clades,
+                                               settings)) as executor:
+                results = list(executor.map(_bootstrapCounts,
+                                            [ task[1] for task in tasks ],
+                                            [ task[2] for task in tasks ]))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    for (i, size, seeds), (task_counts, task_valid) in zip(tasks, results):
+        counts[i] += task_counts
+        n_valid[i] += task_valid
+
+    au, bp = _multiscaleFit(counts, n_valid,
+                            np.asarray(sizes, dtype=float)/n_features)
+    n = len(linkage_matrix)+1
+    return pnd.DataFrame({"au": au,
+                          "bp": bp,
+                          "size": linkage_matrix[:, 3].astype(int),
+                          "height": linkage_matrix[:, 2]},
+                         index=np.arange(n, 2*n-1))
+
+def _initWorker(shm_name, shape, dtype, clades, settings, data = None):
+    '''Attaches the worker process to the shared data matrix.'''
+    if(data is None):
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=shm_name)
+        data = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        # Keep a reference, such that the buffer stays valid
+        _worker["shm"] = shm
+    _worker["data"] = data
+    _worker["clades"] = dict((clade, i) for i, clade in enumerate(clades))
+    _worker["settings"] = settings
+
+def _bootstrapCounts(size, seeds):
+    '''Counts the occurrences of the reference clades in trees built from
+    resampled features. Replicates, for which clustering fails, e.g.
+    because of undefined distances, are not counted.
+    '''
+    data = _worker["data"]
+    clades = _worker["clades"]
+    n_features = data.shape[1]
+
+    counts = np.zeros(len(clades))
+    n_valid = 0
+    for seed in seeds:
+        features = np.random.default_rng(seed).integers(0, n_features, size)
+        try:
+            linkage_matrix = linkageMatrix(data[:, features],
+                                           **_worker["settings"])
+        except ValueError:
+            continue
+        n_valid += 1
+        for clade in cladeHashes(linkage_matrix):
+            i = clades.get(clade)
+            if(i is not None):
+                counts[i] += 1
+
+    return counts, n_valid
+
+def _multiscaleFit(counts, n_valid, scales):
+    '''Fits z(r) = v*sqrt(r) + c/sqrt(r) to the normalized bootstrap
+    probabilities z(r) = -Phi^-1(BP(r)) by weighted least squares, and
+    returns AU = 1-Phi(v-c), and BP = 1-Phi(v+c) per clade.
+    '''
+    use_scales = n_valid > 0
+    scales = scales[use_scales]
+    n_valid = n_valid[use_scales]
+    bp_raw = counts[use_scales]/n_valid[:, None]
+    design = np.column_stack([np.sqrt(scales), 1./np.sqrt(scales)])
+    # Scale closest to the original sample size, used as fallback
+    closest = np.argmin(np.abs(scales-1.)) if len(scales) > 0 else None
+
+    au = np.full(counts.shape[1], np.nan)
+    bp = np.full(counts.shape[1], np.nan)
+    for k in range(counts.shape[1]):
+        p = bp_raw[:, k]
+        informative = (p > 0) & (p < 1)
+        if(informative.sum() < 2):
+            if(closest is not None):
+                au[k] = bp[k] = p[closest]
+            continue
+        z = -norm.ppf(p[informative])
+        weights = (n_valid[informative]*norm.pdf(z)**2/
+                   (p[informative]*(1.-p[informative])))
+        sqrt_weights = np.sqrt(weights)
+        v, c = np.linalg.lstsq(design[informative]*sqrt_weights[:, None],
+                               z*sqrt_weights, rcond=None)[0]
+        au[k] = 1.-norm.cdf(v-c)
+        bp[k] = 1.-norm.cdf(v+c)
+
+    return au, bp
@@ -0,0 +1,291 @@
+'''This module offers functions for computing distances between vectors in
+blocks, without the need of holding a full distance matrix in memory.
+'''
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+# Minimal number of rows in XB, for which the distance computation is split
+# into chunks, that are evaluated in parallel.
+_MIN_PARALLEL_ROWS = 4096
+
+# Maximal number of elements in a block of distances, that is held in memory
+# at once.
+_BLOCK_ELEMENTS = 2**22
+
+nan_policies = ["propagate", "pairwise"]
+nan_metrics = ["correlation", "cosine", "euclidean"]
+
+def nJobs(n_jobs = None):
+    '''Function, that determines the number of worker threads or processes
+    to be used.
+
+    :param n_jobs: Number of workers. If None, or smaller than 1, all
+        available cores are used, defaults to None.
+    :type n_jobs: int, optional
+
+    :return: Number of workers.
+    :rtype: int
+    '''
+    if(n_jobs is None or n_jobs < 1):
+        return os.cpu_count() or 1
+    return n_jobs
+
+class NanOperands(object):
+    '''Class, that holds the masked arrays of the rows of a data matrix,
+    from which nanCdist computes distances. Distances between the same rows
+    can therefore be computed repeatedly, without masking the data again.
+    Rows are selected, and assigned by indexing, as for arrays.
+
+    :param X: Two dimensional array with one observation per row.
+    :type X: :class:`numpy.ndarray`, or :class:`pandas.DataFrame`
+    :param metric: Distance metric, can be either of 'correlation',
+        'cosine', and 'euclidean', defaults to "euclidean".
+    :type metric: str, optional
+    '''
+    def __init__(self, X, metric = "euclidean"):
+        if(not metric in nan_metrics):
+            raise ValueError("Invalid metric for NaN-aware distances: {}. "
+                             "Possible metrics are {}."
+                             .format(metric, ", ".join(nan_metrics)))
+
+        self.metric = metric
+        self.values = np.asarray(X, dtype=float)
+        mask = ~np.isnan(self.values)
+        X = self.values
+        if(metric == "correlation"):
+            # Centering does not change correlations, but improves precision
+            X = X-_nanRowMeans(X, mask)[:, None]
+        self.masked = np.where(mask, X, 0.)
+        self.squares = self.masked*self.masked
+        self.mask = mask.astype(float)
+        self.complete = mask.all(axis=1)
+
+    def _arrays(self):
+        return [self.values, self.masked, self.squares, self.mask,
+                self.complete]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        operands = NanOperands.__new__(NanOperands)
+        operands.metric = self.metric
+        (operands.values,
+         operands.masked,
+         operands.squares,
+         operands.mask,
+         operands.complete) = [array[index] for array in self._arrays()]
+        return operands
+
+    def __setitem__(self, index, operands):
+        for array, values in zip(self._arrays(), operands._arrays()):
+            array[index] = values
+
+    def copy(self):
+        return self[np.arange(len(self))]
+
+def nanCdist(XA, XB, metric = "euclidean"):
+    '''Function, that computes distances between each row of XA and each row
+    of XB, ignoring missing values. Each distance is computed over the
+    pairwise-complete observations, i.e. the positions, at which neither of
+    both vectors is NaN. Euclidean distances are scaled up by the ratio of
+    all to the used positions. Pairs without common observations get a
+    distance of NaN. Distances between rows without missing values are
+    identical to the ones of scipy.spatial.distance.cdist.
+
+    :param XA: Two dimensional array with one observation per row.
+    :type XA: :class:`numpy.ndarray`, or :class:`NanOperands`
+    :param XB: Two dimensional array with one observation per row.
+    :type XB: :class:`numpy.ndarray`, or :class:`NanOperands`
+    :param metric: Distance metric, can be either of 'correlation',
+        'cosine', and 'euclidean', defaults to "euclidean".
+    :type metric: str, optional
+
+    :return: Array of shape (len(XA), len(XB)) containing the distances.
+    :rtype: :class:`numpy.ndarray`
+    '''
+    XA = _nanOperands(XA, metric)
+    XB = _nanOperands(XB, metric)
+
+    complete_a = XA.complete
+    complete_b = XB.complete
+    if(complete_a.all() and complete_b.all()):
+        return cdist(XA.values, XB.values, metric=metric)
+
+    distances = np.empty((len(XA), len(XB)))
+    if(not complete_a.all()):
+        distances[~complete_a] = _maskedDistances(XA[~complete_a], XB,
+                                                  metric)
+    if(complete_a.any()):
+        if(complete_b.any()):
+            distances[np.ix_(complete_a, complete_b)] = cdist(
+                XA.values[complete_a], XB.values[complete_b], metric=metric)
+        if(not complete_b.all()):
+            distances[np.ix_(complete_a, ~complete_b)] = _maskedDistances(
+                XA[complete_a], XB[~complete_b], metric)
+
+    return distances
+
+def nanPdist(X, metric = "euclidean", n_jobs = None):
+    '''Function, that computes the condensed distance matrix of the rows of
+    X, ignoring missing values as described in nanCdist. The distances are
+    computed in blocks of rows.
+
+    :param X: Two dimensional array with one observation per row.
+    :type X: :class:`numpy.ndarray`, or :class:`pandas.DataFrame`
+    :param metric: Distance metric, can be either of 'correlation',
+        'cosine', and 'euclidean', defaults to "euclidean".
+    :type metric: str, optional
+    :param n_jobs: Number of threads used. If None, all available cores are
+        used, defaults to None.
+    :type n_jobs: int, optional
+
+    :return: Condensed distance matrix as returned by
+        scipy.spatial.distance.pdist.
+    :rtype: :class:`numpy.ndarray`
+    '''
+    X = NanOperands(X, metric)
+    n = len(X)
+    distances = np.empty(n*(n-1)//2)
+    block_size = max(1, _BLOCK_ELEMENTS//max(n, 1))
+    n_jobs = nJobs(n_jobs)
+
+    offset = 0
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for start in range(0, n-1, block_size):
+            stop = min(start+block_size, n-1)
+            block = cdistBlock(X[start:stop], X[start:], metric, n_jobs,
+                               executor, nan_policy="pairwise")
+            for row in range(stop-start):
+                length = n-start-row-1
+                distances[offset:offset+length] = block[row, row+1:]
+                offset += length
+
+    return distances
+
+def cdistBlock(XA,
+               XB,
+               metric = "euclidean",
+               n_jobs = None,
+               executor = None,
+               nan_policy = "propagate"):
+    '''Function, that computes the distances between each row of XA and each
+    row of XB. If XB is large, it is split into chunks of rows, and the
+    distances to the chunks are computed in parallel threads.
+
+    :param XA: Two dimensional array with one observation per row. If
+        nan_policy is "pairwise", it may also be given as NanOperands.
+    :type XA: :class:`numpy.ndarray`
+    :param XB: Two dimensional array with one observation per row. If
+        nan_policy is "pairwise", it may also be given as NanOperands.
+    :type XB: :class:`numpy.ndarray`
+    :param metric: Distance metric as accepted by
+        scipy.spatial.distance.cdist, defaults to "euclidean".
+    :type metric: str, optional
+    :param n_jobs: Number of threads used. If None, all available cores are
+        used, defaults to None.
+    :type n_jobs: int, optional
+    :param executor: Thread pool used for the parallel evaluation. If None,
+        a new pool is created for this call, defaults to None.
+    :type executor: :class:`concurrent.futures.ThreadPoolExecutor`, optional
+    :param nan_policy: If "propagate", missing values result in NaN
+        distances. If "pairwise", distances are computed over the
+        pairwise-complete observations using nanCdist, defaults to
+        "propagate".
+    :type nan_policy: str, optional
+
+    :return: Array of shape (len(XA), len(XB)) containing the distances.
+    :rtype: :class:`numpy.ndarray`
+    '''
+    if(nan_policy == "pairwise"):
+        distance_function = nanCdist
+        # Mask the data once, instead of once per chunk
+        XA = _nanOperands(XA, metric)
+        XB = _nanOperands(XB, metric)
+    elif(nan_policy == "propagate"):
+        distance_function = cdist
+    else:
+        raise ValueError("Invalid nan_policy: {}. Possible policies are {}."
+                         .format(nan_policy, ", ".join(nan_policies)))
+
+    n_jobs = nJobs(n_jobs)
+    if(n_jobs == 1 or len(XB) < _MIN_PARALLEL_ROWS):
+        return distance_function(XA, XB, metric=metric)
+
+    bounds = np.linspace(0, len(XB), n_jobs+1).astype(int)
+    distances = np.empty((len(XA), len(XB)))
+
+    def fill(i):
+        distances[:, bounds[i]:bounds[i+1]] = distance_function(
+            XA, XB[bounds[i]:bounds[i+1]], metric=metric)
+
+    if(executor is None):
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(fill, range(n_jobs)))
+    else:
+        list(executor.map(fill, range(n_jobs)))
+
+    return distances
+
+def _nanRowMeans(X, mask):
+    counts = mask.sum(axis=1)
+    sums = np.where(mask, X, 0.).sum(axis=1)
+    return np.divide(sums, counts, out=np.zeros(len(X)), where=counts > 0)
+
+def _nanOperands(X, metric):
+    if(not isinstance(X, NanOperands)):
+        return NanOperands(X, metric)
+    if(X.metric != metric):
+        raise ValueError("NanOperands were created for metric {}, not {}."
+                         .format(X.metric, metric))
+    return X
+
+def _maskedDistances(A, B, metric):
+    '''Computes distances over the pairwise-complete positions, Euclidean
+    distances from masked differences, the others from sums computed as
+    masked matrix products.
+    '''
+    counts = A.mask @ B.mask.T
+    if(metric == "euclidean"):
+        # Differences instead of the expanded products, such that identical
+        # rows have a distance of exactly 0
+        distances = np.empty(counts.shape)
+        for i in range(len(A)):
+            difference = A.masked[i]*B.mask-B.masked*A.mask[i]
+            distances[i] = np.einsum("ij,ij->i", difference, difference)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distances = np.sqrt(distances*A.values.shape[1]/counts)
+        distances[counts == 0] = np.nan
+        return distances
+
+    products = A.masked @ B.masked.T
+    squares_a = A.squares @ B.mask.T
+    squares_b = A.mask @ B.squares.T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if(metric == "cosine"):
+            distances = 1.-products/np.sqrt(squares_a*squares_b)
+            distances = np.clip(distances, 0., 2.)
+        else:
+            sums_a = A.masked @ B.mask.T
+            sums_b = A.mask @ B.masked.T
+            covariance = products-sums_a*sums_b/counts
+            variance_a = squares_a-sums_a*sums_a/counts
+            variance_b = squares_b-sums_b*sums_b/counts
+            distances = 1.-covariance/np.sqrt(variance_a*variance_b)
+            distances = np.clip(distances, 0., 2.)
+    distances[counts == 0] = np.nan
+
+    return distances
+
+def _checkDistances(distances):
+    if(np.isnan(distances).any()):
+        raise ValueError("Distances contain NaN values. With nan_policy "
+                         "'propagate' this is caused by missing values, with "
+                         "'pairwise' by pairs of rows without common "
+                         "observations. Constant rows have undefined "
+                         "correlation distances.")
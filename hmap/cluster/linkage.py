@@ -0,0 +1,69 @@
+'''This module offers a common entry point for hierarchical clustering, used
+by the plot functions and the bootstrap.
+'''
+
+from scipy.spatial.distance import pdist
+from scipy.cluster.hierarchy import linkage
+
+from .distance import nanPdist, nan_policies, _checkDistances
+from .nnchain import nnChainLinkage
+
+def linkageMatrix(data,
+                  distance_metric = "correlation",
+                  linkage_method = "complete",
+                  optimal_ordering = False,
+                  low_memory = False,
+                  n_jobs = None,
+                  nan_policy = "propagate"):
+    '''Function, that computes the linkage matrix of the rows of data, either
+    from the full distance matrix, or with the memory-free nearest-neighbor
+    chain algorithm.
+
+    :param data: Two dimensional array with one observation per row.
+    :type data: :class:`numpy.ndarray`, or :class:`pandas.DataFrame`
+    :param distance_metric: Distance metric as accepted by
+        scipy.spatial.distance.pdist, defaults to "correlation".
+    :type distance_metric: str, optional
+    :param linkage_method: Linkage method as accepted by
+        scipy.cluster.hierarchy.linkage, defaults to "complete".
+    :type linkage_method: str, optional
+    :param optimal_ordering: If True, the leaves are ordered optimally. Not
+        applied if low_memory is True, defaults to False.
+    :type optimal_ordering: bool, optional
+    :param low_memory: If True, use hmap.cluster.nnchain.nnChainLinkage,
+        defaults to False.
+    :type low_memory: bool, optional
+    :param n_jobs: Number of threads used for the distance computations if
+        low_memory is True, or nan_policy is 'pairwise'. If None, all
+        available cores are used, defaults to None.
+    :type n_jobs: int, optional
+    :param nan_policy: If 'pairwise', distances are computed over the
+        pairwise-complete observations, see hmap.cluster.distance.nanCdist.
+        A ValueError is raised, if any pair of rows has no observations in
+        common, defaults to 'propagate'.
+    :type nan_policy: str, optional
+
+    :return: Linkage matrix as returned by scipy.cluster.hierarchy.linkage.
+    :rtype: :class:`numpy.ndarray`
+    '''
+    if(not nan_policy in nan_policies):
+        raise ValueError("Invalid nan_policy: {}. Possible policies are {}."
+                         .format(nan_policy, ", ".join(nan_policies)))
+
+    if(low_memory):
+        return nnChainLinkage(data,
+                              metric=distance_metric,
+                              method=linkage_method,
+                              n_jobs=n_jobs,
+                              nan_policy=nan_policy)
+
+    if(nan_policy == "pairwise"):
+        distance_matrix = nanPdist(data, metric=distance_metric,
+                                   n_jobs=n_jobs)
+    else:
+        distance_matrix = pdist(data, metric=distance_metric)
+    _checkDistances(distance_matrix)
+    return linkage(distance_matrix,
+                   metric=distance_metric,
+                   method=linkage_method,
+                   optimal_ordering=optimal_ordering)
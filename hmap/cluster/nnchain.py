@@ -0,0 +1,357 @@
+'''This module offers hierarchical clustering, that computes distances on the
+fly from the data matrix, instead of storing the condensed distance matrix.
+Memory usage therefore grows linearly with the number of observations.
+Single linkage is computed via a minimum spanning tree, complete, average
+and ward linkage via the nearest-neighbor chain algorithm.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .distance import (cdistBlock, nJobs, nan_policies, NanOperands,
+                       _BLOCK_ELEMENTS, _checkDistances)
+
+methods = ["single", "complete", "average", "ward"]
+
+def nnChainLinkage(data,
+                   metric = "euclidean",
+                   method = "complete",
+                   n_jobs = None,
+                   nan_policy = "propagate"):
+    '''Function, that performs hierarchical clustering on the rows of data,
+    without computing the full distance matrix. The distances are computed
+    in blocks, which are evaluated in parallel threads.
+
+    Memory usage is linear in the number of rows. The runtime of 'single'
+    and 'ward' linkage is quadratic in the number of rows. For 'complete',
+    and 'average' linkage the distances of recently used clusters are
+    cached in a fixed amount of memory. Distances of clusters, that are not
+    cached, are recomputed from all their members, such that the runtime
+    grows up to cubically in the number of rows, if the cache is too small
+    for the data. These methods can therefore be considerably slower than
+    scipy.cluster.hierarchy.linkage.
+
+    :param data: Two dimensional array with one observation per row.
+    :type data: :class:`numpy.ndarray`, or :class:`pandas.DataFrame`
+    :param metric: Distance metric as accepted by
+        scipy.spatial.distance.cdist. The method 'ward' requires 'euclidean',
+        defaults to "euclidean".
+    :type metric: str, optional
+    :param method: Linkage method, can be either of 'single', 'complete',
+        'average', and 'ward', defaults to "complete".
+    :type method: str, optional
+    :param n_jobs: Number of threads used for the distance computations. If
+        None, all available cores are used, defaults to None.
+    :type n_jobs: int, optional
+    :param nan_policy: If "pairwise", distances are computed over the
+        pairwise-complete observations, see
+        hmap.cluster.distance.nanCdist. A ValueError is raised, if any pair
+        of rows has no observations in common. Not supported for 'ward',
+        defaults to "propagate".
+    :type nan_policy: str, optional
+
+    :return: Linkage matrix in the format of
+        scipy.cluster.hierarchy.linkage.
+    :rtype: :class:`numpy.ndarray`
+    '''
+    if(not method in methods):
+        raise ValueError("Invalid method: {}. Possible methods are {}."
+                         .format(method, ", ".join(methods)))
+    if(method == "ward" and metric != "euclidean"):
+        raise ValueError("Method 'ward' requires the distance metric to be "
+                         "'euclidean'.")
+    if(not nan_policy in nan_policies):
+        raise ValueError("Invalid nan_policy: {}. Possible policies are {}."
+                         .format(nan_policy, ", ".join(nan_policies)))
+    if(method == "ward" and nan_policy == "pairwise"):
+        raise ValueError("Method 'ward' does not support nan_policy "
+                         "'pairwise'.")
+
+    data = np.asarray(data, dtype=float)
+    if(data.ndim != 2 or data.shape[0] < 2):
+        raise ValueError("data must be a two dimensional array with at least "
+                         "two rows.")
+    if(nan_policy == "pairwise"):
+        # Mask the data once for all distance computations
+        data = NanOperands(data, metric)
+
+    n_jobs = nJobs(n_jobs)
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        if(method == "single"):
+            merges = _mstMerges(data, metric, n_jobs, executor, nan_policy)
+        elif(method == "ward"):
+            merges = _nnChainMerges(_WardClusters(data, n_jobs, executor))
+        else:
+            merges = _nnChainMerges(_PairwiseClusters(data, metric, method,
+                                                      n_jobs, executor,
+                                                      nan_policy))
+
+    return _labelMerges(merges)
+
+def _mstMerges(data, metric, n_jobs, executor, nan_policy):
+    '''Computes the minimum spanning tree of data using Prim's algorithm.
+    Rows already in the tree are swapped to the end of a working copy of
+    data, such that the remaining rows are always a contiguous block.
+    '''
+    n = len(data)
+    work = data.copy()
+    point_ids = np.arange(n)
+    min_dist = np.full(n, np.inf)
+    parent = np.zeros(n, dtype=int)
+    merges = np.empty((n-1, 3))
+
+    # The current point is kept at the last position of the remaining block
+    work[[0, n-1]] = work[[n-1, 0]]
+    point_ids[[0, n-1]] = point_ids[[n-1, 0]]
+    m = n-1
+    for k in range(n-1):
+        current = point_ids[m]
+        d = cdistBlock(work[m:m+1], work[:m], metric, n_jobs, executor,
+                       nan_policy=nan_policy)[0]
+        _checkDistances(d)
+        closer = d < min_dist[:m]
+        min_dist[:m][closer] = d[closer]
+        parent[:m][closer] = current
+
+        j = np.argmin(min_dist[:m])
+        merges[k] = [parent[j], point_ids[j], min_dist[j]]
+
+        # Move nearest point to the last position of the remaining block
+        m -= 1
+        for array in (work, point_ids, min_dist, parent):
+            array[[j, m]] = array[[m, j]]
+
+    return merges
+
+def _nnChainMerges(clusters):
+    '''Runs the nearest-neighbor chain algorithm on the given cluster state.
+    Clusters are identified by a representative row of data.
+    '''
+    n = clusters.m
+    merges = np.empty((n-1, 3))
+    chain = []
+    for k in range(n-1):
+        if(len(chain) == 0):
+            chain = [clusters.rep[0]]
+
+        while(True):
+            x = chain[-1]
+            d = clusters.distances(x)
+            j = np.argmin(d)
+            # Prefer the previous element of the chain in case of ties
+            if(len(chain) > 1 and d[j] >= d[clusters.pos[chain[-2]]]):
+                j = clusters.pos[chain[-2]]
+            y = clusters.rep[j]
+            if(len(chain) > 1 and y == chain[-2]):
+                break
+            chain.append(y)
+
+        chain = chain[:-2]
+        merges[k] = [x, y, d[j]]
+        clusters.merge(x, y)
+
+    return merges
+
+class _Clusters(object):
+    '''Active clusters of the nearest-neighbor chain algorithm. The first m
+    positions of all arrays hold the active clusters. rep maps positions to
+    representative rows, pos maps representative rows to positions.
+    Subclasses compute the distances of a cluster to all active clusters.
+    '''
+    def __init__(self, n):
+        self.m = n
+        self.rep = np.arange(n)
+        self.pos = np.arange(n)
+        self.size = np.ones(n)
+
+    def _arrays(self):
+        return [self.rep, self.size]
+
+    def merge(self, x, y):
+        '''Stores the merged cluster at the position of y, and moves the
+        last active cluster to the position of x.
+        '''
+        i, j = self.pos[x], self.pos[y]
+        self.m -= 1
+        last = self.m
+        if(i != last):
+            for array in self._arrays():
+                array[i] = array[last]
+            self.pos[self.rep[i]] = i
+
+class _WardClusters(_Clusters):
+    '''Clusters, whose ward distances are computed from their centroids.'''
+    def __init__(self, data, n_jobs, executor):
+        _Clusters.__init__(self, data.shape[0])
+        self.centroids = data.copy()
+        self.n_jobs = n_jobs
+        self.executor = executor
+
+    def _arrays(self):
+        return _Clusters._arrays(self)+[self.centroids]
+
+    def distances(self, x):
+        i = self.pos[x]
+        d = cdistBlock(self.centroids[i:i+1], self.centroids[:self.m],
+                       "sqeuclidean", self.n_jobs, self.executor)[0]
+        _checkDistances(d)
+        size = self.size[:self.m]
+        d = np.sqrt(2.*self.size[i]*size/(self.size[i]+size)*d)
+        d[i] = np.inf
+        return d
+
+    def merge(self, x, y):
+        i, j = self.pos[x], self.pos[y]
+        size = self.size[i]+self.size[j]
+        self.centroids[j] = (self.size[i]*self.centroids[i]+
+                             self.size[j]*self.centroids[j])/size
+        self.size[j] = size
+        _Clusters.merge(self, x, y)
+
+class _PairwiseClusters(_Clusters):
+    '''Clusters, whose complete or average linkage distances are aggregated
+    from the distances between their members. The distance rows of recently
+    queried clusters are cached in a fixed number of slots, and kept up to
+    date on merges by the Lance-Williams update, such that they do not have
+    to be recomputed from the members.
+    '''
+    def __init__(self, data, metric, method, n_jobs, executor, nan_policy):
+        n = len(data)
+        _Clusters.__init__(self, n)
+        self.data = data
+        self.metric = metric
+        self.method = method
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self.nan_policy = nan_policy
+        self.labels = np.arange(n)
+        self.members = dict((i, np.array([i])) for i in range(n))
+        self.block_size = max(1, _BLOCK_ELEMENTS//n)
+
+        # Cached rows, indexed by representative row of the other cluster
+        n_slots = min(n, max(4, _BLOCK_ELEMENTS//n))
+        self.rows = np.zeros((n_slots, n))
+        self.slot_of = {}
+        self.slot_owner = np.full(n_slots, -1)
+        self.last_used = np.zeros(n_slots)
+        self.tick = 0
+
+    def distances(self, x):
+        self.tick += 1
+        if(x in self.slot_of):
+            slot = self.slot_of[x]
+        else:
+            slot = self._freeSlot()
+            self.rows[slot] = self._computeRow(x)
+            self.slot_of[x] = slot
+            self.slot_owner[slot] = x
+        self.last_used[slot] = self.tick
+
+        d = self.rows[slot, self.rep[:self.m]]
+        d[self.pos[x]] = np.inf
+        return d
+
+    def merge(self, x, y):
+        # Relabel the members of the smaller cluster only
+        if(len(self.members[x]) > len(self.members[y])):
+            x, y = y, x
+        i, j = self.pos[x], self.pos[y]
+        size_x, size_y = self.size[i], self.size[j]
+
+        # Lance-Williams update of the cached distances to the new cluster
+        self.rows[:, y] = self._combine(self.rows[:, x], self.rows[:, y],
+                                        size_x, size_y)
+        if(x in self.slot_of and y in self.slot_of):
+            self.rows[self.slot_of[y]] = self._combine(
+                self.rows[self.slot_of[x]], self.rows[self.slot_of[y]],
+                size_x, size_y)
+        elif(y in self.slot_of):
+            self._releaseSlot(y)
+        if(x in self.slot_of):
+            self._releaseSlot(x)
+
+        self.size[j] += size_x
+        self.labels[self.members[x]] = y
+        self.members[y] = np.concatenate([self.members[y],
+                                          self.members.pop(x)])
+        _Clusters.merge(self, x, y)
+
+    def _combine(self, d_x, d_y, size_x, size_y):
+        if(self.method == "average"):
+            return (size_x*d_x+size_y*d_y)/(size_x+size_y)
+        return np.maximum(d_x, d_y)
+
+    def _freeSlot(self):
+        free = np.flatnonzero(self.slot_owner < 0)
+        if(len(free) > 0):
+            return free[0]
+        # Evict the least recently used row
+        slot = np.argmin(self.last_used)
+        self._releaseSlot(self.slot_owner[slot])
+        return slot
+
+    def _releaseSlot(self, x):
+        slot = self.slot_of.pop(x)
+        self.slot_owner[slot] = -1
+        self.last_used[slot] = 0
+
+    def _computeRow(self, x):
+        '''Computes the distances of cluster x to all clusters from the
+        distances between their members, indexed by representative row.
+        '''
+        n = len(self.data)
+        members = self.members[x]
+        aggregated = np.zeros(n) if self.method == "average" else None
+        for start in range(0, len(members), self.block_size):
+            block = members[start:start+self.block_size]
+            d = cdistBlock(self.data[block], self.data, self.metric,
+                           self.n_jobs, self.executor,
+                           nan_policy=self.nan_policy)
+            _checkDistances(d)
+            if(self.method == "average"):
+                aggregated += d.sum(axis=0)
+            elif(aggregated is None):
+                aggregated = d.max(axis=0)
+            else:
+                np.maximum(aggregated, d.max(axis=0), out=aggregated)
+
+        # Aggregate distances of points per cluster
+        if(self.method == "average"):
+            row = np.bincount(self.labels, weights=aggregated, minlength=n)
+            sizes = np.ones(n)
+            sizes[self.rep[:self.m]] = self.size[:self.m]
+            return row/(sizes*len(members))
+        row = np.full(n, -np.inf)
+        np.maximum.at(row, self.labels, aggregated)
+        return row
+
+def _labelMerges(merges):
+    '''Converts merges between representative rows into a linkage matrix,
+    as done by scipy.cluster.hierarchy.linkage.
+    '''
+    n = merges.shape[0]+1
+    merges = merges[np.argsort(merges[:, 2], kind="mergesort")]
+
+    parent = np.arange(2*n-1)
+    size = np.ones(2*n-1)
+
+    def find(x):
+        root = x
+        while(parent[root] != root):
+            root = parent[root]
+        while(parent[x] != root):
+            parent[x], x = root, parent[x]
+        return root
+
+    linkage_matrix = np.empty((n-1, 4))
+    for k in range(n-1):
+        x_root = find(int(merges[k, 0]))
+        y_root = find(int(merges[k, 1]))
+        new = n+k
+        parent[x_root] = parent[y_root] = new
+        size[new] = size[x_root]+size[y_root]
+        linkage_matrix[k] = [min(x_root, y_root), max(x_root, y_root),
+                             merges[k, 2], size[new]]
+
+    return linkage_matrix
@@ -1 +1,2 @@
 from . import layout
+from . import export
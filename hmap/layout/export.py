@@ -0,0 +1,285 @@
+'''This module offers functions for exporting figures as compact vector
+graphics, e.g. for publications with file size limits.
+'''
+
+import io
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.lines import Line2D
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+def compactFigure(fig = None, max_elements = 500, merge_paths = True):
+    '''Function, that reduces the number of vector objects of a figure in
+    place. Panels (axes) with more than max_elements patches, lines, and
+    paths in collections are rasterized at the dpi used for saving. Text,
+    spines, ticks, and legends stay vector graphics. In all other panels
+    patches, and lines of identical style are merged into single paths.
+
+    :param fig: Figure to be compacted, e.g. as created by layoutGrid. If
+        None, the current figure is used, defaults to None.
+    :type fig: :class:`matplotlib.figure.Figure`, optional
+    :param max_elements: Number of elements of a panel, above which its
+        patches, lines, and collections are rasterized, defaults to 500.
+    :type max_elements: int, optional
+    :param merge_paths: If True, merge patches, and lines of identical style
+        in panels, that are not rasterized, defaults to True.
+    :type merge_paths: bool, optional
+
+    :return: List containing one dictionary per panel, with the keys
+        "panel", "elements", i.e. the number of elements before compaction,
+        and "action", which is either "rasterized", "merged", or None.
+    :rtype: list
+    '''
+    fig = fig if fig is not None else plt.gcf()
+
+    panels = []
+    for i, ax in enumerate(fig.axes):
+        elements = _countElements(ax)
+        action = None
+        if(elements > max_elements):
+            for artist in ax.patches+ax.lines+ax.collections:
+                artist.set_rasterized(True)
+            action = "rasterized"
+        elif(merge_paths):
+            if(_mergePatches(ax)+_mergeLines(ax) > 0):
+                action = "merged"
+        panels.append({"panel": _panelLabel(ax, i),
+                       "elements": elements,
+                       "action": action})
+
+    return panels
+
+def panelSizes(fig = None, format = "pdf", dpi = "figure", total = None):
+    '''Function, that determines the contribution of each panel (axes) to
+    the size of the saved figure. The contribution of a panel is the
+    difference in file size when saving the figure with, and without the
+    panel. Note, that the figure is saved once per panel.
+
+    :param fig: Figure to be measured. If None, the current figure is used,
+        defaults to None.
+    :type fig: :class:`matplotlib.figure.Figure`, optional
+    :param format: File format as accepted by savefig, defaults to "pdf".
+    :type format: str, optional
+    :param dpi: Resolution used for saving, defaults to "figure".
+    :type dpi: float, optional
+    :param total: Size of the saved figure in bytes, e.g. of a file it was
+        just saved to. If None, the figure is saved once more to determine
+        it, defaults to None.
+    :type total: int, optional
+
+    :return: Tuple containing the size of the saved figure in bytes, and a
+        dictionary with the contribution of each panel in bytes.
+    :rtype: tuple
+    '''
+    fig = fig if fig is not None else plt.gcf()
+
+    if(total is None):
+        total = _savedSize(fig, format, dpi)
+    sizes = {}
+    for i, ax in enumerate(fig.axes):
+        visible = ax.get_visible()
+        ax.set_visible(False)
+        sizes[_panelLabel(ax, i)] = total-_savedSize(fig, format, dpi)
+        ax.set_visible(visible)
+
+    return total, sizes
+
+def exportFigure(path,
+                 fig = None,
+                 max_elements = 500,
+                 merge_paths = True,
+                 dpi = "figure",
+                 report = False):
+    '''Function, that compacts a figure using compactFigure, and saves it.
+    Optionally the contribution of each panel to the file size is printed.
+
+    :param path: Output file, the format is taken from the extension.
+    :type path: str
+    :param fig: Figure to be exported. If None, the current figure is used,
+        defaults to None.
+    :type fig: :class:`matplotlib.figure.Figure`, optional
+    :param max_elements: Number of elements of a panel, above which it is
+        rasterized, see compactFigure, defaults to 500.
+    :type max_elements: int, optional
+    :param merge_paths: If True, merge patches, and lines of identical style,
+        defaults to True.
+    :type merge_paths: bool, optional
+    :param dpi: Resolution of rasterized panels, defaults to "figure".
+    :type dpi: float, optional
+    :param report: If True, determine, and print the contribution of each
+        panel to the file size. This saves the figure once more per panel,
+        defaults to False.
+    :type report: bool, optional
+
+    :return: List of panel dictionaries as returned by compactFigure. If
+        report is True, each dictionary additionally contains the size in
+        bytes as "size".
+    :rtype: list
+    '''
+    fig = fig if fig is not None else plt.gcf()
+    panels = compactFigure(fig, max_elements=max_elements,
+                           merge_paths=merge_paths)
+    fig.savefig(path, dpi=dpi)
+
+    if(report):
+        format = os.path.splitext(path)[1][1:].lower() or "pdf"
+        total, sizes = panelSizes(fig, format=format, dpi=dpi,
+                                  total=os.path.getsize(path))
+        print("{:<16} {:>10} {:>12} {:>12}".format("panel", "elements",
+                                                   "action", "size [kB]"))
+        for panel in panels:
+            panel["size"] = sizes[panel["panel"]]
+            print("{:<16} {:>10} {:>12} {:>12.1f}".format(
+                panel["panel"], panel["elements"], str(panel["action"]),
+                panel["size"]/1024.))
+        print("{:<16} {:>10} {:>12} {:>12.1f}".format("total", "", "",
+                                                      total/1024.))
+
+    return panels
+
+def _countElements(ax):
+    return (len(ax.patches)+len(ax.lines)+
+            sum(len(collection.get_paths()) for collection in ax.collections))
+
+def _panelLabel(ax, i):
+    '''Names a panel by its position in the grid, e.g. "gs[2, 0]".'''
+    subplotspec = ax.get_subplotspec()
+    if(subplotspec is None):
+        return ax.get_label() or "axes {}".format(i)
+
+    def span(indices):
+        if(len(indices) == 1):
+            return str(indices[0])
+        return "{}:{}".format(indices[0], indices[-1]+1)
+
+    return "gs[{}, {}]".format(span(subplotspec.rowspan),
+                               span(subplotspec.colspan))
+
+def _savedSize(fig, format, dpi):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, dpi=dpi)
+    return buffer.tell()
+
+def _isMergeable(artist):
+    '''Only visible, unlabeled, and not rasterized artists are merged, such
+    that legend entries are not affected.
+    '''
+    label = artist.get_label()
+    return ((not label or label.startswith("_")) and
+            not artist.get_rasterized() and
+            artist.get_visible())
+
+def _mergePatches(ax):
+    '''Merges patches of identical style into one PathPatch per style.
+    Returns the number of removed patches.
+    '''
+    groups = {}
+    for patch in ax.patches:
+        if(not _isMergeable(patch) or
+           patch.get_data_transform() is not ax.transData):
+            continue
+        key = (tuple(patch.get_facecolor()), tuple(patch.get_edgecolor()),
+               patch.get_linewidth(), str(patch.get_linestyle()),
+               patch.get_hatch(), patch.get_fill(), patch.get_capstyle(),
+               patch.get_joinstyle(), patch.get_clip_on(),
+               patch.get_zorder())
+        groups.setdefault(key, []).append(patch)
+
+    removed = 0
+    for patches in groups.values():
+        if(len(patches) < 2):
+            continue
+        template = patches[0]
+        path = Path.make_compound_path(*[
+            patch.get_patch_transform().transform_path(patch.get_path())
+            for patch in patches ])
+        merged = PathPatch(path,
+                           facecolor=template.get_facecolor(),
+                           edgecolor=template.get_edgecolor(),
+                           linewidth=template.get_linewidth(),
+                           linestyle=template.get_linestyle(),
+                           hatch=template.get_hatch(),
+                           fill=template.get_fill(),
+                           capstyle=template.get_capstyle(),
+                           joinstyle=template.get_joinstyle(),
+                           zorder=template.get_zorder())
+        merged.set_clip_on(template.get_clip_on())
+        for patch in patches:
+            patch.remove()
+        ax.add_artist(merged)
+        removed += len(patches)-1
+
+    return removed
+
+def _mergeLines(ax):
+    '''Merges solid lines without markers, and line collections with a
+    single color, and line width into one Line2D per style, separating the
+    segments by NaN. Returns the number of removed artists.
+    '''
+    groups = {}
+    for line in ax.lines:
+        if(not _isMergeable(line) or
+           line.get_transform() is not ax.transData or
+           line.get_marker() not in ["None", "", " ", None] or
+           line.get_linestyle() != "-" or
+           line.get_drawstyle() != "default"):
+            continue
+        key = (to_rgba(line.get_color(), line.get_alpha()),
+               line.get_linewidth(), line.get_solid_capstyle(),
+               line.get_solid_joinstyle(), line.get_clip_on(),
+               line.get_zorder())
+        segments = [np.column_stack([line.get_xdata(orig=False),
+                                     line.get_ydata(orig=False)])]
+        groups.setdefault(key, []).append((line, segments))
+
+    for collection in ax.collections:
+        if(not isinstance(collection, LineCollection) or
+           not _isMergeable(collection) or
+           collection.get_transform() is not ax.transData or
+           len(collection.get_offsets()) > 1 or
+           np.any(collection.get_offsets() != 0)):
+            continue
+        colors = np.unique(collection.get_colors(), axis=0)
+        linewidths = np.unique(collection.get_linewidths())
+        if(len(colors) != 1 or len(linewidths) != 1 or
+           any(dashes is not None
+               for offset, dashes in collection.get_linestyles())):
+            continue
+        # Collections are drawn with butt caps, and round joins by default
+        key = (tuple(colors[0]), linewidths[0],
+               collection.get_capstyle() or "butt",
+               collection.get_joinstyle() or "round",
+               collection.get_clip_on(), collection.get_zorder())
+        groups.setdefault(key, []).append((collection,
+                                           collection.get_segments()))
+
+    removed = 0
+    for key, members in groups.items():
+        n_segments = sum(len(segments) for artist, segments in members)
+        if(n_segments < 2):
+            continue
+        color, linewidth, capstyle, joinstyle, clip_on, zorder = key
+        vertices = []
+        for artist, segments in members:
+            for segment in segments:
+                vertices.append(segment)
+                vertices.append([[np.nan, np.nan]])
+        vertices = np.concatenate(vertices[:-1])
+        merged = Line2D(vertices[:, 0], vertices[:, 1],
+                        color=color,
+                        linewidth=linewidth,
+                        solid_capstyle=capstyle,
+                        solid_joinstyle=joinstyle,
+                        zorder=zorder)
+        merged.set_clip_on(clip_on)
+        for artist, segments in members:
+            artist.remove()
+        ax.add_artist(merged)
+        removed += n_segments-1
+
+    return removed
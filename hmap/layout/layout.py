@@ -5,7 +5,7 @@ from matplotlib.gridspec import GridSpec
 import matplotlib.pyplot as plt
 
 def layoutGrid(nrows, ncols, row_widths, col_heights, hspace, wspace, bottom,
-               top, left, right):
+               top, left, right, fig=None):
     '''Function, that makes a grid layout using extensions given in mm.
 
     :param nrows: Number of rows in the grid.
@@ -28,6 +28,9 @@ def layoutGrid(nrows, ncols, row_widths, col_heights, hspace, wspace, bottom,
     :type left: float
     :param right: Right space of grid in mm.
     :type right: float
+    :param fig: Existing figure, that is resized and reused instead of
+        creating a new figure, defaults to None.
+    :type fig: :class:`matplotlib.figure.Figure`, optional
 
     :return: A tuple of type :class:`matplotlib.figure.Figure`, defining the
         figure on which the grid is defined, and 
@@ -40,9 +43,12 @@ def layoutGrid(nrows, ncols, row_widths, col_heights, hspace, wspace, bottom,
     overall_height = float(sum(col_heights)+float(nrows-1)*hspace+bottom+top)
 
 	# Declare figure width overall extensions in inches
-    fig = plt.figure(figsize = (overall_width/25.4,
-                                overall_height/25.4),
-                     dpi=300)
+    if(fig is None):
+        fig = plt.figure(figsize = (overall_width/25.4,
+                                    overall_height/25.4),
+                         dpi=300)
+    else:
+        fig.set_size_inches(overall_width/25.4, overall_height/25.4)
 
 	# Define fractions of left, right, bottom and top
     left_frac = left/overall_width
@@ -1 +1,3 @@
 from . import basic
+from . import batch
+from . import interactive
@@ -1,8 +1,7 @@
 '''This class offers basic plot Functions for generating nice heatmaps.
 '''
 
-from scipy.spatial.distance import pdist
-from scipy.cluster.hierarchy import linkage, dendrogram, cut_tree
+from scipy.cluster.hierarchy import dendrogram, cut_tree
 import numpy as np
 
 import matplotlib.pyplot as plt
@@ -10,6 +9,8 @@ from matplotlib.patches import Rectangle
 
 import pandas as pnd
 
+from ..cluster.linkage import linkageMatrix
+
 ##################
 # Some color lists
 colors = {}
@@ -43,6 +44,9 @@ def Heatmap(table,
         show_plot = True,
         optimal_row_ordering = True,
         optimal_col_ordering = True,
+        low_memory = False,
+        n_jobs = None,
+        nan_policy = "propagate",
         ax = None):
     """Function that plots a two dimensional matrix as clustered heatmap.
     Sorting of rows and columns is done by hierarchical clustering.
@@ -111,6 +115,25 @@ def Heatmap(table,
         Can take a long time, depending on the number of columns, defaults
         to True.
     :type optimal_col_ordering: bool, optional
+    :param low_memory: If True, the clustering is computed without the full
+        distance matrix, using hmap.cluster.nnchain.nnChainLinkage. Only the
+        linkage methods 'single', 'complete', 'average', and 'ward' are
+        supported. Optimal ordering requires the full distance matrix, and is
+        therefore not applied. Note, that 'complete', and 'average' linkage
+        can be many times slower than with the full distance matrix, and in
+        the worst case their runtime grows cubically with the number of
+        rows, defaults to False.
+    :type low_memory: bool, optional
+    :param n_jobs: Number of threads used for the distance computations if
+        low_memory is True, or nan_policy is 'pairwise'. If None, all
+        available cores are used, defaults to None.
+    :type n_jobs: int, optional
+    :param nan_policy: If 'propagate', missing values result in NaN
+        distances, and clustering fails. If 'pairwise', distances are
+        computed over the pairwise-complete observations, which is only
+        supported for the distance metrics 'correlation', 'cosine', and
+        'euclidean', defaults to 'propagate'.
+    :type nan_policy: str, optional
     :param ax: Axes instance on which to plot heatmap, defaults to None.
     :type ax: :class:`matplotlib.axes._subplots.AxesSubplot`,
         optional
@@ -131,11 +154,13 @@ def Heatmap(table,
     # Sort column names
     column_names_reordered = list(table.columns)
     if(column_clustering):
-        distance_matrix = pdist(table.T, metric=distance_metric)
-        linkage_matrix = linkage(distance_matrix,
-                                 metric=distance_metric,
-                                 method=linkage_method,
-                                 optimal_ordering=optimal_col_ordering)
+        linkage_matrix = linkageMatrix(table.T,
+                                       distance_metric=distance_metric,
+                                       linkage_method=linkage_method,
+                                       optimal_ordering=optimal_col_ordering,
+                                       low_memory=low_memory,
+                                       n_jobs=n_jobs,
+                                       nan_policy=nan_policy)
         dendrogram_dict = dendrogram(linkage_matrix, no_plot=True)
 
         leaves = dendrogram_dict["leaves"]
@@ -148,11 +173,13 @@ def Heatmap(table,
     # Sort row names
     row_names_reordered = list(table.index)
     if(row_clustering):
-        distance_matrix = pdist(table, metric=distance_metric)
-        linkage_matrix = linkage(distance_matrix,
-                                 metric=distance_metric,
-                                 method=linkage_method,
-                                 optimal_ordering=optimal_row_ordering)
+        linkage_matrix = linkageMatrix(table,
+                                       distance_metric=distance_metric,
+                                       linkage_method=linkage_method,
+                                       optimal_ordering=optimal_row_ordering,
+                                       low_memory=low_memory,
+                                       n_jobs=n_jobs,
+                                       nan_policy=nan_policy)
         dendrogram_dict = dendrogram(linkage_matrix, no_plot=True)
 
         leaves = dendrogram_dict["leaves"]
@@ -214,6 +241,9 @@ def Dendrogram(table,
         n_clust = None,
         optimal_row_ordering=True,
         optimal_col_ordering=True,
+        low_memory = False,
+        n_jobs = None,
+        nan_policy = "propagate",
         ax = None):
     """Function that plots a dendrogram on axis 0 (rows), or axis 1
     (columns) of a :class:`pandas.DataFrame`.
@@ -251,6 +281,25 @@ def Dendrogram(table,
         with regards to the cluster separation. Be careuful: Can take a long
         time, depending on the number of columns, defaults to True.
     :type optimal_col_ordering: bool, optional
+    :param low_memory: If True, the clustering is computed without the full
+        distance matrix, using hmap.cluster.nnchain.nnChainLinkage. Only the
+        linkage methods 'single', 'complete', 'average', and 'ward' are
+        supported. Optimal ordering requires the full distance matrix, and is
+        therefore not applied. Note, that 'complete', and 'average' linkage
+        can be many times slower than with the full distance matrix, and in
+        the worst case their runtime grows cubically with the number of
+        rows, defaults to False.
+    :type low_memory: bool, optional
+    :param n_jobs: Number of threads used for the distance computations if
+        low_memory is True, or nan_policy is 'pairwise'. If None, all
+        available cores are used, defaults to None.
+    :type n_jobs: int, optional
+    :param nan_policy: If 'propagate', missing values result in NaN
+        distances, and clustering fails. If 'pairwise', distances are
+        computed over the pairwise-complete observations, which is only
+        supported for the distance metrics 'correlation', 'cosine', and
+        'euclidean', defaults to 'propagate'.
+    :type nan_policy: str, optional
     :param ax: Axes n which to plot the dendrogram, defaults to None.
     :type ax: :class:`matplotlib.axes._subplots.AxesSubplot`
 
@@ -273,11 +322,13 @@ def Dendrogram(table,
     color_threshold = 0
     if(axis == 0):
         ids = list(table.index)
-        distance_matrix = pdist(table, metric=distance_metric)
-        linkage_matrix = linkage(distance_matrix,
-                                 metric=distance_metric,
-                                 method=linkage_method,
-                                 optimal_ordering=optimal_row_ordering)
+        linkage_matrix = linkageMatrix(table,
+                                       distance_metric=distance_metric,
+                                       linkage_method=linkage_method,
+                                       optimal_ordering=optimal_row_ordering,
+                                       low_memory=low_memory,
+                                       n_jobs=n_jobs,
+                                       nan_policy=nan_policy)
         if(not n_clust is None):
             cluster_dict = {}
             color_threshold = linkage_matrix[-1*(n_clust-1), 2]
@@ -294,10 +345,13 @@ def Dendrogram(table,
                                          color_threshold = color_threshold)
     elif(axis == 1):
         ids = table.columns
-        distance_matrix = pdist(table.T, metric=distance_metric)
-        linkage_matrix = linkage(distance_matrix, metric=distance_metric,
-                                 method=linkage_method,
-                                 optimal_ordering=optimal_col_ordering)
+        linkage_matrix = linkageMatrix(table.T,
+                                       distance_metric=distance_metric,
+                                       linkage_method=linkage_method,
+                                       optimal_ordering=optimal_col_ordering,
+                                       low_memory=low_memory,
+                                       n_jobs=n_jobs,
+                                       nan_policy=nan_policy)
         if(not n_clust is None):
             cluster_dict = {}
             color_threshold = linkage_matrix[-1*(n_clust-1), 2]
@@ -323,6 +377,63 @@ def Dendrogram(table,
 
     return dendrogram_dict, linkage_matrix, cluster_dict
 
+def ClusterStability(dendrogram_dict,
+        linkage_matrix,
+        stability,
+        axis = 1,
+        value = "au",
+        fontsize = 5,
+        ax = None):
+    """Function that plots cluster stability values at the branch points of
+    a dendrogram plotted by the Dendrogram function. Values are given in
+    percent.
+
+    :param dendrogram_dict: Dictionary returned by Dendrogram.
+    :type dendrogram_dict: dict
+    :param linkage_matrix: Linkage matrix returned by Dendrogram.
+    :type linkage_matrix: :class:`numpy.ndarray`
+    :param stability: DataFrame containing the stability values, indexed by
+        cluster id, as returned by
+        hmap.cluster.bootstrap.bootstrapStability.
+    :type stability: :class:`pandas.DataFrame`
+    :param axis: Axis used for plotting the dendrogram (0 = rows,
+        1 = columns), defaults to 1.
+    :type axis: int, optional
+    :param value: Column of stability, that is plotted, defaults to "au".
+    :type value: str, optional
+    :param fontsize: Font size of the values, defaults to 5.
+    :type fontsize: float, optional
+    :param ax: Axes on which the dendrogram was plotted, defaults to None.
+    :type ax: :class:`matplotlib.axes._subplots.AxesSubplot`, optional
+
+    :return: Nothing to be returned.
+    :rtype: None
+    """
+    ax = ax if ax is not None else plt.gca()
+
+    # Leaf positions as used by scipy.cluster.hierarchy.dendrogram, branch
+    # points are centered between their children
+    n = len(linkage_matrix)+1
+    positions = np.zeros(2*n-1)
+    positions[dendrogram_dict["leaves"]] = 5.+10.*np.arange(n)
+    for k in range(n-1):
+        a, b = int(linkage_matrix[k, 0]), int(linkage_matrix[k, 1])
+        positions[n+k] = (positions[a]+positions[b])/2.
+
+        score = stability.loc[n+k, value]
+        if(np.isnan(score)):
+            continue
+        label = str(int(round(100.*score)))
+        height = linkage_matrix[k, 2]
+        if(axis == 0):
+            ax.text(height, positions[n+k], label, fontsize=fontsize,
+                    horizontalalignment="right",
+                    verticalalignment="center")
+        else:
+            ax.text(positions[n+k], height, label, fontsize=fontsize,
+                    horizontalalignment="center",
+                    verticalalignment="bottom")
+
 def Annotation(ids_sorted,
                annotation_df,
                annotation_col_id,
@@ -412,7 +523,6 @@ def Annotation(ids_sorted,
                                                         annotation_col_id]]
             else:
                 value = annotation_df.loc[id_current, annotation_col_id]
-                print(type(value))
                 color = "w"
                 if(not(np.isnan(value))):
                     color = cmap((float(value)-min_val)/
@@ -606,7 +716,7 @@ def Legends(patch_list_dict,
                                bbox_to_anchor=(x, y),
                                frameon = False)
             plt.draw()
-            p = legend.get_window_extent().inverse_transformed(ax.transAxes)
+            p = legend.get_window_extent().transformed(ax.transAxes.inverted())
             if(p.p0[1] < 0):
                 legend.remove()
                 y = 1
@@ -620,7 +730,7 @@ def Legends(patch_list_dict,
                                bbox_to_anchor=(x, y),
                                frameon=False)
                 plt.draw()
-                p = legend.get_window_extent().inverse_transformed(ax.transAxes)
+                p = legend.get_window_extent().transformed(ax.transAxes.inverted())
 
             if(p.p1[0] > x_max):
                 x_max = p.p1[0]+2.*(1./width)
@@ -635,7 +745,7 @@ def Legends(patch_list_dict,
                         extent=[x, x+color_scale_width, y, y-color_scale_height],
                         vmin=0
                       )
-            p = img.get_window_extent().inverse_transformed(ax.transAxes)
+            p = img.get_window_extent().transformed(ax.transAxes.inverted())
             if(p.y1-6.*(1./height) <= 0):
                 img.remove()
                 y = 1.-4.*(1./height)
@@ -646,7 +756,7 @@ def Legends(patch_list_dict,
                         extent=[x, x+color_scale_width, y, y-color_scale_height],
                         vmin=0
                       )
-                p = img.get_window_extent().inverse_transformed(ax.transAxes)
+                p = img.get_window_extent().transformed(ax.transAxes.inverted())
 
             # Plot annotation ID
             plt.text(x+color_scale_width/2.,
@@ -0,0 +1,331 @@
+'''This module offers functions for rendering many clustered heatmap figures
+in parallel processes.
+'''
+
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib.pyplot as plt
+from pandas.api.types import is_float_dtype
+
+from ..layout.layout import layoutGrid
+from ..cluster.distance import nJobs
+from . import basic
+
+# Default extensions of the figure layout in mm
+default_layout = {"dendrogram_size": 10.,
+                  "annotation_size": 2.,
+                  "heatmap_width": 80.,
+                  "heatmap_height": 80.,
+                  "legend_width": 40.,
+                  "space": 1.,
+                  "bottom": 20.,
+                  "top": 15.,
+                  "left": 15.,
+                  "right": 20.}
+
+# Keyword arguments of Heatmap, that are passed on to Dendrogram
+_dendrogram_keys = ["distance_metric", "linkage_method",
+                    "optimal_row_ordering", "optimal_col_ordering",
+                    "low_memory", "n_jobs", "nan_policy"]
+
+# Figure and axes of the current process, that are reused between jobs
+_figure = None
+_axes = None
+_layout_key = None
+
+def renderFigure(spec):
+    '''Function, that renders a clustered heatmap figure, consisting of
+    dendrograms, annotations, heatmap, and legends, and saves it to disk. The
+    figure, and if the layout did not change also the axes, of the previous
+    call are reused.
+
+    :param spec: Dictionary defining the figure. Keys are "table"
+        (:class:`pandas.DataFrame`, required), "output" (path of the output
+        file, required), "row_annotation", and "column_annotation"
+        (:class:`pandas.DataFrame` with annotations of rows, and columns of
+        table), "row_annotation_columns", and "column_annotation_columns"
+        (lists of annotation columns to be plotted), "color_dict" (dict of
+        color dicts per annotation column), "heatmap" (dict of keyword
+        arguments passed to Heatmap, distance_metric, linkage_method,
+        optimal ordering, low_memory, n_jobs, and nan_policy are passed to
+        Dendrogram as well), "layout" (dict overriding entries of
+        default_layout, all extensions in mm), and "dpi" (resolution of the
+        saved figure).
+        Annotation columns of float type are plotted as continuous, all other
+        columns as categorial annotations.
+    :type spec: dict
+
+    :return: Dictionary containing "output", the path of the output file,
+        "time", the overall time in seconds, "stages", a dict with the time
+        spent in each stage, and "error", the formatted traceback if the
+        rendering failed, else None.
+    :rtype: dict
+    '''
+    start = time.time()
+    stages = {}
+    error = None
+    try:
+        _render(spec, stages)
+    except Exception:
+        error = traceback.format_exc()
+
+    return {"output": spec.get("output"),
+            "time": time.time()-start,
+            "stages": stages,
+            "error": error}
+
+def iterRenderBatch(specs, n_jobs = None):
+    '''Function, that renders a list of figures in a process pool. Each
+    figure is saved to disk by the worker as soon as it is finished.
+
+    :param specs: List of figure specifications as described in
+        renderFigure.
+    :type specs: list
+    :param n_jobs: Number of worker processes. If None, all available cores
+        are used. If 1, the figures are rendered in the current process with
+        interactive mode turned off, and the figure is closed when the batch
+        is finished, defaults to None.
+    :type n_jobs: int, optional
+
+    :return: Generator yielding the result dictionaries of renderFigure in
+        the order in which the figures are finished. Each dictionary
+        additionally holds the index of the figure in specs as "index".
+    :rtype: generator
+    '''
+    n_jobs = nJobs(n_jobs)
+    if(n_jobs == 1):
+        # Switching the backend would close all figures of the caller, so
+        # interactive mode is turned off instead, such that no window is
+        # shown, and the figure is closed at the end of the batch
+        interactive = plt.isinteractive()
+        plt.ioff()
+        try:
+            for index, spec in enumerate(specs):
+                result = renderFigure(spec)
+                result["index"] = index
+                yield result
+        finally:
+            _releaseFigure()
+            if(interactive):
+                plt.ion()
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs,
+                             initializer=_initWorker) as executor:
+        futures = dict((executor.submit(renderFigure, spec), index)
+                       for index, spec in enumerate(specs))
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                # The worker itself failed, e.g. spec could not be pickled
+                result = {"output": specs[index].get("output"),
+                          "time": float("nan"),
+                          "stages": {},
+                          "error": traceback.format_exc()}
+            result["index"] = index
+            yield result
+
+def renderBatch(specs, n_jobs = None, verbose = True):
+    '''Function, that renders a list of figures in a process pool. Failing
+    figures are reported, but do not abort the batch.
+
+    :param specs: List of figure specifications as described in
+        renderFigure.
+    :type specs: list
+    :param n_jobs: Number of worker processes. If None, all available cores
+        are used. If 1, the figures are rendered in the current process,
+        defaults to None.
+    :type n_jobs: int, optional
+    :param verbose: If True, print one line per finished figure, and the
+        tracebacks of failed figures, defaults to True.
+    :type verbose: bool, optional
+
+    :return: List of result dictionaries as returned by iterRenderBatch,
+        sorted in the order of specs.
+    :rtype: list
+    '''
+    results = []
+    for result in iterRenderBatch(specs, n_jobs=n_jobs):
+        results.append(result)
+        if(verbose):
+            status = "ok" if result["error"] is None else "FAILED"
+            print("[{}/{}] {}: {} ({:.2f} s)".format(len(results),
+                                                    len(specs),
+                                                    result["output"],
+                                                    status,
+                                                    result["time"]))
+
+    failed = [ result for result in results if result["error"] is not None ]
+    if(verbose and len(failed) > 0):
+        print("{} of {} figures failed:".format(len(failed), len(specs)))
+        for result in failed:
+            print(result["output"])
+            print(result["error"])
+
+    return sorted(results, key=lambda result: result["index"])
+
+def _initWorker():
+    '''Selects the non-interactive Agg backend in worker processes.'''
+    plt.switch_backend("Agg")
+
+def _releaseFigure():
+    '''Closes the figure of the current process.'''
+    global _figure, _axes, _layout_key
+
+    if(_figure is not None):
+        plt.close(_figure)
+    _figure = None
+    _axes = None
+    _layout_key = None
+
+def _allAxes(axes):
+    for value in axes.values():
+        if(isinstance(value, list)):
+            for ax in value:
+                yield ax
+        else:
+            yield value
+
+def _figureAxes(n_row_annotations, n_column_annotations, layout):
+    '''Returns the figure and axes of the current process. The axes are
+    cleared and reused if the layout did not change since the last call,
+    else the figure is cleared and the axes are created anew.
+    '''
+    global _figure, _axes, _layout_key
+
+    layout_key = (n_row_annotations, n_column_annotations,
+                  tuple(sorted(layout.items())))
+    if(_figure is not None and layout_key == _layout_key):
+        for ax in _allAxes(_axes):
+            ax.cla()
+        return _figure, _axes
+
+    if(_figure is None):
+        _figure = plt.figure(dpi=300)
+    else:
+        _figure.clf()
+
+    # Columns: row dendrogram, row annotations, heatmap, legends
+    # Rows: column dendrogram, column annotations, heatmap
+    widths = ([layout["dendrogram_size"]]+
+              [layout["annotation_size"]]*n_row_annotations+
+              [layout["heatmap_width"], layout["legend_width"]])
+    heights = ([layout["dendrogram_size"]]+
+               [layout["annotation_size"]]*n_column_annotations+
+               [layout["heatmap_height"]])
+    fig, gs = layoutGrid(len(heights), len(widths), widths, heights,
+                         layout["space"], layout["space"], layout["bottom"],
+                         layout["top"], layout["left"], layout["right"],
+                         fig=_figure)
+
+    _axes = {"heatmap": fig.add_subplot(gs[-1, -2]),
+             "row_dendrogram": fig.add_subplot(gs[-1, 0]),
+             "column_dendrogram": fig.add_subplot(gs[0, -2]),
+             "legends": fig.add_subplot(gs[-1, -1]),
+             "row_annotations": [ fig.add_subplot(gs[-1, 1+i])
+                                  for i in range(n_row_annotations) ],
+             "column_annotations": [ fig.add_subplot(gs[1+i, -2])
+                                     for i in range(n_column_annotations) ]}
+    _layout_key = layout_key
+
+    return _figure, _axes
+
+def _render(spec, stages):
+    '''Renders the figure defined by spec, and saves it. The time spent in
+    each stage is stored in stages.
+    '''
+    def stage(name, start):
+        stages[name] = time.time()-start
+        return time.time()
+
+    start = time.time()
+    table = spec["table"]
+    heatmap_kwargs = dict(spec.get("heatmap", {}))
+    # Parallelism is already given by the process pool
+    heatmap_kwargs.setdefault("n_jobs", 1)
+    dendrogram_kwargs = dict((key, heatmap_kwargs[key])
+                             for key in _dendrogram_keys
+                             if key in heatmap_kwargs)
+    layout = dict(default_layout)
+    layout.update(spec.get("layout", {}))
+    color_dict = spec.get("color_dict", {})
+
+    row_annotation_df = spec.get("row_annotation")
+    column_annotation_df = spec.get("column_annotation")
+    row_annotation_columns = (list(spec.get("row_annotation_columns", []))
+                              if row_annotation_df is not None else [])
+    column_annotation_columns = (
+        list(spec.get("column_annotation_columns", []))
+        if column_annotation_df is not None else [])
+
+    fig, axes = _figureAxes(len(row_annotation_columns),
+                            len(column_annotation_columns),
+                            layout)
+    start = stage("layout", start)
+
+    # Plot dendrograms, the heatmap reuses their leaf order instead of
+    # clustering again
+    plot_kwargs = dict(heatmap_kwargs)
+    for axis, key, clustering_key, custom_key, ids in [
+            (0, "row_dendrogram", "row_clustering", "custom_row_clustering",
+             list(table.index)),
+            (1, "column_dendrogram", "column_clustering",
+             "custom_column_clustering", list(table.columns))]:
+        ax = axes[key]
+        plt.sca(ax)
+        if(heatmap_kwargs.get(clustering_key, True)):
+            dendrogram_dict = basic.Dendrogram(table, axis=axis, ax=ax,
+                                               **dendrogram_kwargs)[0]
+            plot_kwargs[clustering_key] = False
+            plot_kwargs[custom_key] = [ ids[i] for i in
+                                        dendrogram_dict["leaves"] ]
+        else:
+            ax.axis("off")
+    start = stage("dendrograms", start)
+
+    # Plot heatmap
+    plt.sca(axes["heatmap"])
+    column_ids, row_ids, vmin, vmax = basic.Heatmap(table,
+                                                    ax=axes["heatmap"],
+                                                    **plot_kwargs)
+    start = stage("heatmap", start)
+
+    # Plot annotations, legends of columns annotating both rows and columns
+    # are named by axis
+    shared_columns = set(row_annotation_columns)&set(column_annotation_columns)
+    patch_list_dict = {}
+    for axis, ids, annotation_df, annotation_columns, key, suffix in [
+            (0, row_ids, row_annotation_df, row_annotation_columns,
+             "row_annotations", " (rows)"),
+            (1, column_ids, column_annotation_df, column_annotation_columns,
+             "column_annotations", " (columns)")]:
+        for ax, annotation_col_id in zip(axes[key], annotation_columns):
+            plt.sca(ax)
+            legend_id = (str(annotation_col_id)+suffix
+                         if annotation_col_id in shared_columns
+                         else annotation_col_id)
+            patch_list_dict[legend_id] = basic.Annotation(
+                ids,
+                annotation_df,
+                annotation_col_id,
+                axis=axis,
+                is_categorial=not is_float_dtype(
+                    annotation_df[annotation_col_id]),
+                color_dict=color_dict.get(annotation_col_id),
+                ax=ax)
+    start = stage("annotations", start)
+
+    # Plot legends
+    plt.sca(axes["legends"])
+    if(len(patch_list_dict) > 0):
+        basic.Legends(patch_list_dict, ax=axes["legends"])
+    else:
+        axes["legends"].axis("off")
+    start = stage("legends", start)
+
+    fig.savefig(spec["output"], dpi=spec.get("dpi", "figure"))
+    stage("savefig", start)
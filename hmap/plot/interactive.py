@@ -0,0 +1,204 @@
+'''This module offers a heatmap, that can be updated in place, e.g. for
+interactive dashboards, or time series panels.
+'''
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from . import basic
+
+class UpdatableHeatmap(object):
+    '''Class, that plots a heatmap using the Heatmap function, and holds the
+    created image. Values, color limits, and the order of rows and columns
+    can then be updated in place, without creating new artists. Clustering
+    is only recomputed if explicitly requested.
+
+    :param table: Two dimensional array containing numerical values.
+    :type table: :class:`pandas.DataFrame`
+    :param blit: If True, updates of the values and color limits only redraw
+        the heatmap image using blitting, if supported by the backend. Note,
+        that the image is then marked as animated, and is therefore excluded
+        from savefig, defaults to False.
+    :type blit: bool, optional
+    :param ax: Axes instance on which to plot heatmap, defaults to None.
+    :type ax: :class:`matplotlib.axes._subplots.AxesSubplot`, optional
+    :param heatmap_kwargs: Further keyword arguments passed to Heatmap, e.g.
+        cmap, distance_metric, linkage_method, vmin, vmax. They are also used
+        when reclustering.
+    :type heatmap_kwargs: dict
+    '''
+    def __init__(self, table, blit = False, ax = None, **heatmap_kwargs):
+        self.ax = ax if ax is not None else plt.gca()
+        self.table = table
+        self.heatmap_kwargs = heatmap_kwargs
+        self.blit = blit
+
+        plt.sca(self.ax)
+        (self.column_ids,
+         self.row_ids,
+         self.vmin,
+         self.vmax) = basic.Heatmap(table, show_plot=True, ax=self.ax,
+                                    **heatmap_kwargs)
+        self.image = self.ax.images[-1]
+        self.vmin, self.vmax = self.image.get_clim()
+
+        self._background = None
+        self._full_redraw = True
+        self._draw_cid = None
+        if(self.blit):
+            self.image.set_animated(True)
+            self._draw_cid = self.ax.figure.canvas.mpl_connect(
+                "draw_event", self._onDraw)
+
+    def set_data(self, table, recluster = False):
+        '''Sets new values. The rows and columns keep their current order,
+        unless recluster is True. The color limits are kept as well, use
+        set_clim to change them.
+
+        :param table: Two dimensional array containing numerical values. If
+            recluster is False it has to contain all current row and column
+            ids.
+        :type table: :class:`pandas.DataFrame`
+        :param recluster: If True, rows and columns are reclustered as
+            defined in the keyword arguments given to the constructor,
+            defaults to False.
+        :type recluster: bool, optional
+        '''
+        self.table = table
+        if(recluster):
+            self.recluster()
+        else:
+            self._updateImage()
+
+    def set_clim(self, vmin = None, vmax = None):
+        '''Sets the color limits of the heatmap. If vmin, or vmax are None,
+        they are taken from the current values. If symmetric_color_scale was
+        given to the constructor, the limits are made symmetric around
+        symmetry_point.
+
+        :param vmin: Minimal value, that has a color representation, defaults
+            to None.
+        :type vmin: float, optional
+        :param vmax: Maximal value, that has a color representation, defaults
+            to None.
+        :type vmax: float, optional
+
+        :return: Tuple of vmin, and vmax used.
+        :rtype: tuple
+        '''
+        values = self.table.loc[self.row_ids, self.column_ids].values
+        if(vmin is None):
+            vmin = np.nanmin(values)
+        if(vmax is None):
+            vmax = np.nanmax(values)
+        if(self.heatmap_kwargs.get("symmetric_color_scale", False)):
+            symmetry_point = self.heatmap_kwargs.get("symmetry_point", 0)
+            abs_max = max([abs(vmin-symmetry_point),
+                           abs(vmax-symmetry_point)])
+            vmin = symmetry_point - abs_max
+            vmax = symmetry_point + abs_max
+
+        self.vmin, self.vmax = vmin, vmax
+        self.image.set_clim(vmin, vmax)
+        return vmin, vmax
+
+    def reorder(self, row_ids = None, column_ids = None):
+        '''Sets a new order of rows, and or columns. The ids may also be a
+        subset of the ids of the table.
+
+        :param row_ids: List of row ids in the order they should appear in
+            the heatmap, if None the order is kept, defaults to None.
+        :type row_ids: list, optional
+        :param column_ids: List of column ids in the order they should appear
+            in the heatmap, if None the order is kept, defaults to None.
+        :type column_ids: list, optional
+        '''
+        if(row_ids is not None):
+            self.row_ids = list(row_ids)
+        if(column_ids is not None):
+            self.column_ids = list(column_ids)
+        self._updateImage()
+        self._updateLabels()
+
+    def recluster(self, rows = None, columns = None):
+        '''Recomputes the clustering of rows, and or columns of the current
+        values, and reorders the heatmap accordingly.
+
+        :param rows: If True, the rows are reclustered. If None, the
+            row_clustering argument given to the constructor is used,
+            defaults to None.
+        :type rows: bool, optional
+        :param columns: If True, the columns are reclustered. If None, the
+            column_clustering argument given to the constructor is used,
+            defaults to None.
+        :type columns: bool, optional
+
+        :return: Tuple of the reordered column ids, and row ids.
+        :rtype: tuple
+        '''
+        if(rows is None):
+            rows = self.heatmap_kwargs.get("row_clustering", True)
+        if(columns is None):
+            columns = self.heatmap_kwargs.get("column_clustering", True)
+
+        heatmap_kwargs = dict(self.heatmap_kwargs)
+        heatmap_kwargs.update({"row_clustering": rows,
+                               "column_clustering": columns,
+                               "custom_row_clustering": None,
+                               "custom_column_clustering": None})
+        column_ids, row_ids, vmin, vmax = basic.Heatmap(self.table,
+                                                        show_plot=False,
+                                                        **heatmap_kwargs)
+        self.reorder(row_ids if rows else None,
+                     column_ids if columns else None)
+        return self.column_ids, self.row_ids
+
+    def draw(self):
+        '''Redraws the heatmap. If blitting is enabled, and neither labels
+        nor the shape of the heatmap changed since the last full draw, only
+        the image is redrawn.
+        '''
+        canvas = self.ax.figure.canvas
+        if(self.blit and not self._full_redraw and
+           self._background is not None and canvas.supports_blit):
+            canvas.restore_region(self._background)
+            self.ax.draw_artist(self.image)
+            canvas.blit(self.ax.bbox)
+        else:
+            canvas.draw()
+
+    def disconnect(self):
+        '''Disconnects the handle from the draw events of the canvas.'''
+        if(self._draw_cid is not None):
+            self.ax.figure.canvas.mpl_disconnect(self._draw_cid)
+            self._draw_cid = None
+
+    def _onDraw(self, event):
+        '''Stores the background of the axes after a full draw, and draws the
+        animated image on top of it.
+        '''
+        canvas = self.ax.figure.canvas
+        if(canvas.supports_blit):
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.image)
+        self._full_redraw = False
+
+    def _updateImage(self):
+        values = self.table.loc[self.row_ids, self.column_ids].values
+        if(values.shape != self.image.get_array().shape):
+            nrows, ncols = values.shape
+            self.image.set_extent((-0.5, ncols-.5, -0.5, nrows-.5))
+            self.ax.set_xlim(-0.5, ncols-.5)
+            self.ax.set_ylim(-0.5, nrows-.5)
+            self._full_redraw = True
+        self.image.set_data(values)
+
+    def _updateLabels(self):
+        if(self.heatmap_kwargs.get("show_column_labels", False)):
+            self.ax.set_xticks(range(len(self.column_ids)))
+            self.ax.set_xticklabels(self.column_ids, rotation=90, fontsize=7)
+            self._full_redraw = True
+        if(self.heatmap_kwargs.get("show_row_labels", False)):
+            self.ax.set_yticks(range(len(self.row_ids)))
+            self.ax.set_yticklabels(self.row_ids, fontsize=7)
+            self._full_redraw = True
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pnd
+from scipy.cluster.hierarchy import linkage
+
+from hmap.cluster.bootstrap import bootstrapStability, cladeHashes
+
+def test_clade_hashes_identify_leaf_sets():
+    # Same clusters, merged in a different order
+    first = np.array([[0, 1, 1., 2], [2, 3, 2., 2], [4, 5, 3., 4]])
+    second = np.array([[2, 3, 1., 2], [0, 1, 2., 2], [4, 5, 3., 4]])
+    other = np.array([[0, 2, 1., 2], [1, 3, 2., 2], [4, 5, 3., 4]])
+    assert set(cladeHashes(first)) == set(cladeHashes(second))
+    assert set(cladeHashes(first)) & set(cladeHashes(other)) == set(
+        cladeHashes(first)[-1:])
+
+def test_results_independent_of_n_jobs():
+    rng = np.random.default_rng(0)
+    table = pnd.DataFrame(np.vstack([rng.normal(0, 1, (6, 30)),
+                                     rng.normal(3, 1, (6, 30))]))
+    linkage_matrix = linkage(table.values, method="average")
+    kwargs = {"distance_metric": "euclidean",
+              "linkage_method": "average",
+              "linkage_matrix": linkage_matrix,
+              "n_boot": 20,
+              "seed": 1}
+    serial = bootstrapStability(table, n_jobs=1, **kwargs)
+    parallel = bootstrapStability(table, n_jobs=2, **kwargs)
+    pnd.testing.assert_frame_equal(serial, parallel)
+    # Both groups are separated in every replicate
+    assert (serial.loc[serial["size"] == 6, "bp"] == 1.).all()
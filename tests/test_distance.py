@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist, pdist
+
+from hmap.cluster.distance import nanCdist, nanPdist
+from hmap.cluster.linkage import linkageMatrix
+from hmap.cluster.nnchain import nnChainLinkage
+
+@pytest.mark.parametrize("metric", ["correlation", "cosine", "euclidean"])
+def test_complete_data_matches_cdist(metric):
+    data = np.random.default_rng(0).normal(size=(30, 8))
+    np.testing.assert_array_equal(nanCdist(data, data, metric=metric),
+                                  cdist(data, data, metric=metric))
+    np.testing.assert_array_equal(nanPdist(data, metric=metric, n_jobs=1),
+                                  pdist(data, metric=metric))
+
+@pytest.mark.parametrize("metric", ["correlation", "cosine", "euclidean"])
+def test_missing_values_use_pairwise_complete_observations(metric):
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(12, 10))
+    data[rng.random(size=data.shape) < 0.2] = np.nan
+    data[0] = rng.normal(size=10)
+
+    expected = np.empty((len(data), len(data)))
+    for i, a in enumerate(data):
+        for j, b in enumerate(data):
+            used = ~(np.isnan(a) | np.isnan(b))
+            expected[i, j] = cdist(a[None, used], b[None, used],
+                                   metric=metric)[0, 0]
+            if(metric == "euclidean"):
+                expected[i, j] *= np.sqrt(data.shape[1]/used.sum())
+    np.testing.assert_allclose(nanCdist(data, data, metric=metric),
+                               expected, atol=1e-10)
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_rows_without_common_observations(low_memory):
+    data = np.random.default_rng(2).normal(size=(6, 4))
+    data[0, :2] = np.nan
+    data[1, 2:] = np.nan
+    with pytest.raises(ValueError, match="common observations"):
+        linkageMatrix(data, distance_metric="euclidean",
+                      linkage_method="average", low_memory=low_memory,
+                      nan_policy="pairwise")
+
+def test_pairwise_low_memory_matches_full_matrix():
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=(40, 12))
+    data[rng.random(size=data.shape) < 0.1] = np.nan
+    for method in ["single", "complete", "average"]:
+        expected = linkageMatrix(data, distance_metric="correlation",
+                                 linkage_method=method, n_jobs=1,
+                                 nan_policy="pairwise")
+        result = nnChainLinkage(data, metric="correlation", method=method,
+                                n_jobs=1, nan_policy="pairwise")
+        np.testing.assert_allclose(result, expected)
+
+def test_invalid_nan_policy():
+    data = np.zeros((5, 2))
+    with pytest.raises(ValueError):
+        linkageMatrix(data, nan_policy="omit")
+    with pytest.raises(ValueError):
+        linkageMatrix(data, low_memory=True, nan_policy="omit")
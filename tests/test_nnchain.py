@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from scipy.cluster.hierarchy import linkage
+from scipy.spatial.distance import pdist
+
+from hmap.cluster import nnchain
+from hmap.cluster.nnchain import nnChainLinkage
+
+@pytest.mark.parametrize("method, metric", [("single", "euclidean"),
+                                            ("single", "correlation"),
+                                            ("complete", "cityblock"),
+                                            ("average", "correlation"),
+                                            ("ward", "euclidean")])
+@pytest.mark.parametrize("n", [2, 3, 17, 120])
+def test_matches_scipy_linkage(method, metric, n):
+    data = np.random.default_rng(n).normal(size=(n, 6))
+    expected = linkage(pdist(data, metric=metric), method=method)
+    result = nnChainLinkage(data, metric=metric, method=method, n_jobs=2)
+    np.testing.assert_allclose(result, expected)
+
+@pytest.mark.parametrize("method", ["complete", "average"])
+def test_matches_scipy_linkage_with_small_cache(method, monkeypatch):
+    # Few cache slots force evictions, and recomputation from members
+    monkeypatch.setattr(nnchain, "_BLOCK_ELEMENTS", 400)
+    data = np.random.default_rng(0).normal(size=(100, 4))
+    expected = linkage(pdist(data), method=method)
+    result = nnChainLinkage(data, method=method, n_jobs=1)
+    np.testing.assert_allclose(result, expected)
+
+def test_invalid_arguments():
+    data = np.zeros((5, 2))
+    with pytest.raises(ValueError):
+        nnChainLinkage(data, method="centroid")
+    with pytest.raises(ValueError):
+        nnChainLinkage(data, metric="cityblock", method="ward")